@@ -1,30 +1,50 @@
 # app/main.py
 
-from fastapi import FastAPI, Request, HTTPException
-from fastapi.responses import HTMLResponse
+import time
+_MODULE_LOAD_STARTED = time.perf_counter()
+
+from fastapi import BackgroundTasks, Depends, FastAPI, Request, HTTPException
+from fastapi.responses import FileResponse, HTMLResponse, JSONResponse, StreamingResponse
+from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 import smtplib
 from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
 from email.mime.application import MIMEApplication
 from databases import Database
-from sqlalchemy import Date, Text, MetaData, Table, Column, Integer, DateTime, func
+from sqlalchemy import Date, Text, MetaData, Table, Column, Integer, DateTime, func, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.schema import CreateTable
 import os
 from dotenv import load_dotenv
-from weasyprint import HTML
 from jinja2 import Environment, FileSystemLoader
-from datetime import datetime
+from datetime import date, datetime, timedelta
 import uuid
+import ipaddress
+import csv
+import io
 import base64
+import asyncio
+import logging
+import json
+import re
+import zlib
+import threading
+from email import message_from_bytes
+from bisect import bisect_left, insort
+from collections import OrderedDict
+from functools import lru_cache
 from pathlib import Path
 
 # --- Path-safe base dirs (fixes template/asset mismatches) ---
 BASE_DIR = Path(__file__).resolve().parent               # .../app
 TEMPLATES_DIR = BASE_DIR / "templates"                  # .../app/templates
 ASSETS_DIR = BASE_DIR / "assets"                        # .../app/assets
+STATIC_DIR = BASE_DIR / "static"                        # .../app/static
 
 app = FastAPI()
 templates = Jinja2Templates(directory=str(TEMPLATES_DIR))
+app.mount("/static", StaticFiles(directory=str(STATIC_DIR)), name="static")
 load_dotenv()
 
 COMPANY_EMAIL = os.getenv("COMPANY_EMAIL")
@@ -34,6 +54,61 @@ SMTP_USERNAME = os.getenv("EMAIL_USERNAME")
 SMTP_PASSWORD = os.getenv("EMAIL_PASSWORD")
 FROM_EMAIL = os.getenv("FROM_EMAIL")
 
+# --- SMTP delivery resilience (timeout, circuit breaker, local spool) ---
+SMTP_TIMEOUT = float(os.getenv("SMTP_TIMEOUT", "10"))
+SMTP_FAILURE_THRESHOLD = int(os.getenv("SMTP_FAILURE_THRESHOLD", "3"))
+SMTP_BREAKER_COOLDOWN = float(os.getenv("SMTP_BREAKER_COOLDOWN", "60"))
+MAIL_SPOOL_FLUSH_INTERVAL = float(os.getenv("MAIL_SPOOL_FLUSH_INTERVAL", "30"))
+# Default lives next to app/ (not inside it) so deploy rsync --delete keeps it
+MAIL_SPOOL_DIR = Path(os.getenv("MAIL_SPOOL_DIR", str(BASE_DIR.parent / "mail_spool")))
+# Messages the relay permanently rejected (e.g. a mistyped contact_email)
+MAIL_DEAD_LETTER_DIR = MAIL_SPOOL_DIR / "dead_letter"
+
+# --- Dispatcher-only endpoints (customer data) ---
+# Comma-separated CIDRs; defaults to localhost only, so the dispatch
+# office's range has to be listed explicitly (e.g. "10.20.0.0/16,127.0.0.1/32")
+INTERNAL_NETWORKS = [
+    ipaddress.ip_network(network.strip())
+    for network in os.getenv("INTERNAL_NETWORKS", "127.0.0.0/8,::1/128").split(",")
+    if network.strip()
+]
+
+# --- Customer autocomplete (in-memory prefix index) ---
+AUTOCOMPLETE_MAX_CUSTOMERS = int(os.getenv("AUTOCOMPLETE_MAX_CUSTOMERS", "50000"))
+# Approximate budget for profile text (characters); long free-text fields
+# are clipped so a few pasted addresses can't crowd out everyone else
+AUTOCOMPLETE_MAX_BYTES = int(os.getenv("AUTOCOMPLETE_MAX_BYTES", str(32 * 1024 * 1024)))
+AUTOCOMPLETE_MAX_FIELD_LENGTH = 200
+AUTOCOMPLETE_MAX_RESULTS = 25
+
+# --- Equipment service history (per-serial summary) ---
+REPEAT_FAILURE_DAYS = int(os.getenv("REPEAT_FAILURE_DAYS", "30"))
+EQUIPMENT_HISTORY_RECENT = 20
+# Values techs type when the plate is missing or unreadable (normalized)
+SERIAL_PLACEHOLDERS = {"N/A", "NA", "N.A.", "NONE", "NULL", "UNKNOWN", "UNK", "TBD", "NOSERIAL", "NOTAVAILABLE"}
+MIN_SERIAL_LENGTH = 3
+
+# --- Warm-up retries ---
+WARM_UP_MAX_BACKOFF = 300
+
+# --- Monthly partitions + archival (only active once the table is partitioned) ---
+PARTITION_PREMAKE_MONTHS = 2
+ARCHIVE_AFTER_MONTHS = int(os.getenv("ARCHIVE_AFTER_MONTHS", "24"))
+ARCHIVE_INTERVAL = float(os.getenv("ARCHIVE_INTERVAL", str(6 * 60 * 60)))
+ARCHIVE_BATCH_ROWS = 10000
+# Archival (detach + drop old partitions) is opt-in: off unless ARCHIVE_DIR is set
+ARCHIVE_DIR = Path(os.environ["ARCHIVE_DIR"]) if os.getenv("ARCHIVE_DIR") else None
+# Latest export end date whose month arithmetic stays inside date's range
+EXPORT_MAX_DATE = date(9999, 12, 1)
+
+# --- Offline client replay endpoint ---
+MAX_REPLAY_BYTES = 5 * 1024 * 1024     # decompressed
+MAX_REPLAY_BATCH = 50
+MAX_IDEMPOTENCY_KEY_LENGTH = 100
+
+# Child of uvicorn's logger so messages go through the handlers uvicorn configures
+logger = logging.getLogger("uvicorn.error").getChild("servicerequestform")
+
 load_dotenv(override=True)
 DATABASE_URL = os.getenv("DATABASE_URL")
 
@@ -70,16 +145,93 @@ service_request_forms = Table(
     Column("created_at", DateTime, default=func.now()),
 )
 
+# Idempotency keys of offline replays. Kept in its own (unpartitioned) table
+# so the primary key can enforce uniqueness across all months; created at
+# startup if missing.
+submission_idempotency_keys = Table(
+    "submission_idempotency_keys",
+    metadata,
+    Column("idempotency_key", Text, primary_key=True),
+    Column("request_id", Integer),
+    Column("created_at", DateTime, nullable=False, server_default=func.now()),
+)
+
+# Startup profile (seconds per phase) - exposed on /readyz
+STARTUP_PROFILE = {"module_load_s": round(time.perf_counter() - _MODULE_LOAD_STARTED, 3)}
+app.state.ready = False
+
 @app.on_event("startup")
 async def startup():
+    started = time.perf_counter()
     if not database.is_connected:
         await database.connect()
+    STARTUP_PROFILE["db_connect_s"] = round(time.perf_counter() - started, 3)
+
+    await database.execute(CreateTable(submission_idempotency_keys, if_not_exists=True))
+
+    MAIL_SPOOL_DIR.mkdir(parents=True, exist_ok=True)
+    app.state.spool_flusher = asyncio.create_task(spool_flusher())
+    app.state.archiver = asyncio.create_task(partition_archiver())
+
+    # Warm up in the background so liveness answers immediately;
+    # readiness stays false until the indexes are built and a PDF has rendered.
+    app.state.warm_up = asyncio.create_task(warm_up())
+
+async def warm_up():
+    """
+    Build the in-memory indexes and render a throwaway PDF so
+    WeasyPrint/Pango/fonts are initialised before the first real
+    submission, then mark the worker ready.
+    """
+    await run_with_backoff("Index load", "indexes_s", load_indexes)
+    await run_with_backoff(
+        "Warm-up PDF render",
+        "warm_up_s",
+        lambda: asyncio.to_thread(generate_pdf, WARM_UP_FORM_DATA),
+    )
+    app.state.ready = True
+    logger.info("Worker ready; startup profile: %s", STARTUP_PROFILE)
+
+async def run_with_backoff(description: str, profile_key: str, step):
+    """
+    Run one warm-up step until it succeeds, backing off exponentially,
+    and record its duration in the startup profile.
+    """
+    delay = 1
+    while True:
+        started = time.perf_counter()
+        try:
+            await step()
+        except Exception:
+            logger.exception("%s failed; retrying in %ds", description, delay)
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, WARM_UP_MAX_BACKOFF)
+            continue
+        STARTUP_PROFILE[profile_key] = round(time.perf_counter() - started, 3)
+        return
 
 @app.on_event("shutdown")
 async def shutdown():
+    for task_name in ("warm_up", "spool_flusher", "archiver"):
+        task = getattr(app.state, task_name, None)
+        if task:
+            task.cancel()
+
     if database.is_connected:
         await database.disconnect()
 
+@app.get("/healthz")
+async def liveness():
+    return {"status": "ok"}
+
+@app.get("/readyz")
+async def readiness():
+    ready = app.state.ready and database.is_connected
+    return JSONResponse(
+        status_code=200 if ready else 503,
+        content={"status": "ready" if ready else "starting", "startup_profile": STARTUP_PROFILE},
+    )
+
 @app.get("/", response_class=HTMLResponse)
 async def get_form(request: Request):
     return templates.TemplateResponse("form.html", {"request": request})
@@ -91,12 +243,151 @@ async def confirmation_page(request: Request, customer_name: str = None):
         {"request": request, "customer_name": customer_name},
     )
 
+def require_internal(request: Request):
+    """
+    Dependency for endpoints that expose customer data: only clients on
+    INTERNAL_NETWORKS (the dispatch office) may call them.
+    """
+    try:
+        client_ip = ipaddress.ip_address(request.client.host)
+    except (AttributeError, ValueError):
+        client_ip = None
+
+    if client_ip is None or not any(client_ip in network for network in INTERNAL_NETWORKS):
+        raise HTTPException(status_code=403, detail="Not available from this network")
+
+@app.get("/api/customers/autocomplete", dependencies=[Depends(require_internal)])
+async def customer_autocomplete(q: str = "", limit: int = 10):
+    """
+    Prefix lookup on customer name / account number, served from memory.
+    """
+    limit = max(1, min(limit, AUTOCOMPLETE_MAX_RESULTS))
+    return {"results": customer_index.search(q, limit)}
+
+@app.get("/api/equipment/{serial}/history", dependencies=[Depends(require_internal)])
+async def equipment_history(serial: str):
+    """
+    Service history for one serial number, served from the in-memory summary.
+    """
+    summary = equipment_index.get(serial)
+    if summary is None:
+        raise HTTPException(status_code=404, detail="No service history for this serial number")
+    return summary
+
+@app.get("/api/requests/export", dependencies=[Depends(require_internal)])
+async def export_requests(start: date, end: date):
+    """
+    CSV export of submissions with start <= created_at date < end,
+    covering both live partitions and archived months. Streamed a month
+    at a time, so a multi-year range never sits in memory.
+    """
+    if end <= start:
+        raise HTTPException(status_code=400, detail="end must be after start")
+    if end > EXPORT_MAX_DATE:
+        raise HTTPException(status_code=400, detail=f"end must be on or before {EXPORT_MAX_DATE.isoformat()}")
+
+    rows = iterate_service_requests(
+        datetime.combine(start, datetime.min.time()),
+        datetime.combine(end, datetime.min.time()),
+    )
+
+    filename = f"service_requests_{start.isoformat()}_{end.isoformat()}.csv"
+    return StreamingResponse(
+        csv_chunks(rows),
+        media_type="text/csv",
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
 @app.post("/submit", response_class=HTMLResponse)
 async def submit_form(request: Request):
     # Grab all form fields
     form_data = await request.form()
-    ip_address = request.client.host
+    submission = await store_submission(form_data, request.client.host)
+    await deliver_submission(submission)
+    customer_name = submission["customer_name"]
 
+    # Return confirmation page
+    return templates.TemplateResponse(
+        "confirmation.html",
+        {"request": request, "customer_name": customer_name},
+    )
+
+@app.post("/api/submissions")
+async def replay_submissions(request: Request, background_tasks: BackgroundTasks):
+    """
+    Compact JSON submit endpoint used by the offline client.
+    Accepts one submission or {"submissions": [...]}, optionally gzip'd
+    (Content-Encoding: gzip). Each submission carries an idempotency_key,
+    so replays of an already-stored request are acknowledged, not re-inserted.
+
+    Per-item status: created | duplicate | rejected (invalid, don't retry) |
+    error (not stored, retry later). PDFs and emails for created items are
+    produced after the response is sent.
+    """
+    body = await read_body_limited(request, MAX_REPLAY_BYTES)
+    if request.headers.get("content-encoding", "").lower() == "gzip":
+        body = gunzip_limited(body, MAX_REPLAY_BYTES)
+
+    try:
+        payload = json.loads(body)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid JSON body")
+
+    submissions = payload.get("submissions", [payload]) if isinstance(payload, dict) else payload
+    if not isinstance(submissions, list) or len(submissions) > MAX_REPLAY_BATCH:
+        raise HTTPException(status_code=400, detail=f"Expected up to {MAX_REPLAY_BATCH} submissions")
+
+    results = []
+    created = []
+    for submission in submissions:
+        if not isinstance(submission, dict):
+            results.append({"idempotency_key": None, "status": "rejected", "detail": "Submission must be an object"})
+            continue
+
+        key = str(submission.get("idempotency_key") or "").strip()
+        if not key:
+            results.append({"idempotency_key": None, "status": "rejected", "detail": "Missing idempotency_key"})
+            continue
+        if len(key) > MAX_IDEMPOTENCY_KEY_LENGTH:
+            results.append({"idempotency_key": key, "status": "rejected", "detail": "idempotency_key is too long"})
+            continue
+
+        fields = {k: str(v) for k, v in submission.items() if v is not None and k != "idempotency_key"}
+        try:
+            stored = await store_submission(fields, request.client.host, idempotency_key=key)
+        except HTTPException as exc:
+            results.append({"idempotency_key": key, "status": "rejected", "detail": exc.detail})
+            continue
+        except Exception:
+            # Transaction rolled back: nothing stored, the client retries it
+            logger.exception("Storing replayed submission %s failed", key)
+            results.append({"idempotency_key": key, "status": "error"})
+            continue
+
+        if stored is None:
+            results.append({"idempotency_key": key, "status": "duplicate"})
+            continue
+
+        created.append(stored)
+        results.append({"idempotency_key": key, "status": "created"})
+
+    if created:
+        background_tasks.add_task(deliver_submissions, created)
+
+    return {"results": results}
+
+@app.get("/sw.js")
+async def service_worker():
+    # Served from the root so the worker's scope covers the form at "/"
+    return FileResponse(STATIC_DIR / "sw.js", media_type="application/javascript")
+
+
+async def store_submission(form_data, ip_address: str, idempotency_key: str = None):
+    """
+    Validate and store one submission (form post or JSON replay).
+    Returns the data deliver_submission() needs, or None if idempotency_key
+    was already used (the request is stored; nothing to do).
+    """
     customer_name = form_data.get("customer_name")
     account_number = form_data.get("account_number")
     customer_address = form_data.get("customer_address")
@@ -148,7 +439,11 @@ async def submit_form(request: Request):
 
     # Generate a unique form ID for tracking
     form_id = str(uuid.uuid4())
-    current_datetime = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    submitted_at = datetime.now()
+    current_datetime = submitted_at.strftime("%Y-%m-%d %H:%M:%S")
+
+    # Flag repeat failures on this serial (checked before this row is indexed)
+    repeat_failure = equipment_index.repeat_failure(equipment_serial_number, submitted_at)
 
     # Structure for PDF rendering
     full_form_data = {
@@ -172,6 +467,7 @@ async def submit_form(request: Request):
         "ip_address": ip_address,
         "form_id": form_id,
         "current_datetime": current_datetime,
+        "repeat_failure": repeat_failure,
     }
 
     # Prepare DB insert
@@ -196,17 +492,60 @@ async def submit_form(request: Request):
         "ip_address": ip_address,
     }
 
-    insert_query = service_request_forms.insert().values(**query_data)
-    await database.execute(insert_query)
+    insert_query = (
+        service_request_forms.insert()
+        .values(**query_data)
+        .returning(service_request_forms.c.id)
+    )
+
+    # Key claim and row insert commit together: a key exists iff its row does
+    async with database.transaction():
+        if idempotency_key:
+            claim_query = (
+                pg_insert(submission_idempotency_keys)
+                .values(idempotency_key=idempotency_key)
+                .on_conflict_do_nothing(index_elements=["idempotency_key"])
+                .returning(submission_idempotency_keys.c.idempotency_key)
+            )
+            if await database.fetch_val(claim_query) is None:
+                return None
+
+        record_id = await database.fetch_val(insert_query)
+
+        if idempotency_key:
+            await database.execute(
+                submission_idempotency_keys.update()
+                .where(submission_idempotency_keys.c.idempotency_key == idempotency_key)
+                .values(request_id=record_id)
+            )
+
+    index_row({**query_data, "id": record_id, "created_at": submitted_at})
+    return full_form_data
+
+
+async def deliver_submission(full_form_data: dict):
+    """
+    Render the PDF for a stored submission and queue the company and
+    customer emails.
+    """
+    contact_email = full_form_data["contact_email"]
+    equipment_serial_number = full_form_data["equipment_serial_number"]
+    repeat_failure = full_form_data["repeat_failure"]
 
     # Generate PDF from template
-    pdf_data = generate_pdf(full_form_data)
+    pdf_data = await asyncio.to_thread(generate_pdf, full_form_data)
 
     # Email bodies
     company_body = (
         "A new Service Request Form was submitted.\n"
         "Please see the attached PDF."
     )
+    if repeat_failure:
+        company_body += (
+            f"\n\nREPEAT FAILURE: serial {equipment_serial_number} has "
+            f"{repeat_failure['count']} prior request(s) in the last "
+            f"{repeat_failure['window_days']} days (most recent {repeat_failure['last_date']})."
+        )
 
     customer_body = (
         "Thank you. Your service request has been received by Graves Foods.\n"
@@ -214,6 +553,7 @@ async def submit_form(request: Request):
     )
 
     # Send internal copy to company
+    # (queued to the local spool; the background flusher delivers it)
     send_email(
         COMPANY_EMAIL,
         "New Service Request Form Submission",
@@ -230,11 +570,43 @@ async def submit_form(request: Request):
             pdf_data,
         )
 
-    # Return confirmation page
-    return templates.TemplateResponse(
-        "confirmation.html",
-        {"request": request, "customer_name": customer_name},
-    )
+
+async def deliver_submissions(submissions: list):
+    """
+    Background task for replayed batches: one failure must not stop the rest.
+    """
+    for submission in submissions:
+        try:
+            await deliver_submission(submission)
+        except Exception:
+            logger.exception("Delivering submission %s failed", submission["form_id"])
+
+
+# Dummy submission used only by warm_up()
+WARM_UP_FORM_DATA = {
+    "customer_name": "Warm-up",
+    "date": None,
+    "form_id": "warm-up",
+    "current_datetime": "",
+}
+
+
+@lru_cache(maxsize=1)
+def get_pdf_template():
+    """
+    Load (once) the Jinja template used for PDF rendering.
+    """
+    env = Environment(loader=FileSystemLoader(str(TEMPLATES_DIR)))
+    return env.get_template("pdf_template.html")
+
+
+@lru_cache(maxsize=1)
+def get_logo_data() -> str:
+    """
+    Read (once) the logo embedded in the PDF as base64.
+    """
+    with open(ASSETS_DIR / "logo_sm.png", "rb") as image_file:
+        return base64.b64encode(image_file.read()).decode("utf-8")
 
 
 def generate_pdf(data: dict) -> bytes:
@@ -242,20 +614,19 @@ def generate_pdf(data: dict) -> bytes:
     Generate a PDF from template using the data dictionary.
     Path-safe + passes all fields to template to prevent blanks.
     """
-    env = Environment(loader=FileSystemLoader(str(TEMPLATES_DIR)))
-    template = env.get_template("pdf_template.html")
+    # Imported lazily: WeasyPrint (Pango, fonts) is the slowest import and
+    # is not needed to serve GET /. warm_up() pays this cost at startup.
+    from weasyprint import HTML
+
+    template = get_pdf_template()
 
     # Convert date to string for display
     date_str = data["date"].strftime("%Y-%m-%d") if data.get("date") else ""
 
-    # Embed logo as base64 for PDF
-    with open(ASSETS_DIR / "logo_sm.png", "rb") as image_file:
-        logo_data = base64.b64encode(image_file.read()).decode("utf-8")
-
     # Pass EVERYTHING (prevents missing new fields in PDF)
     render_data = dict(data)
     render_data["date"] = date_str
-    render_data["logo_data"] = logo_data
+    render_data["logo_data"] = get_logo_data()
 
     html_content = template.render(**render_data)
 
@@ -264,9 +635,178 @@ def generate_pdf(data: dict) -> bytes:
     return pdf_data
 
 
+class CircuitBreaker:
+    """
+    Consecutive-failure circuit breaker around SMTP delivery.
+    closed -> open after `threshold` failures in a row; after `cooldown`
+    seconds one trial delivery is let through (half-open).
+    """
+
+    def __init__(self, threshold: int, cooldown: float):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at = None
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.cooldown:
+            return "half-open"
+        return "open"
+
+    def allow(self) -> bool:
+        with self._lock:
+            state = self.state
+            if state == "closed":
+                return True
+            if state == "half-open" and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._trial_in_flight = False
+            if self.failures >= self.threshold:
+                # (re)open - restarts the cooldown after a failed trial too
+                self.opened_at = time.monotonic()
+
+
+smtp_breaker = CircuitBreaker(SMTP_FAILURE_THRESHOLD, SMTP_BREAKER_COOLDOWN)
+
+
+def deliver_message(to_email: str, msg_bytes: bytes):
+    """
+    Hand a fully built message to the SMTP relay (raises on failure).
+    """
+    with smtplib.SMTP(SMTP_SERVER, SMTP_PORT, timeout=SMTP_TIMEOUT) as server:
+        server.starttls()
+        server.login(SMTP_USERNAME, SMTP_PASSWORD)
+        server.sendmail(FROM_EMAIL, to_email, msg_bytes)
+
+
+def spool_message(msg_bytes: bytes) -> Path:
+    """
+    Write a message to the local spool as an .eml file.
+    Written to a temp name then renamed so the flusher never reads a partial file.
+    """
+    MAIL_SPOOL_DIR.mkdir(parents=True, exist_ok=True)
+    name = f"{time.time_ns()}-{uuid.uuid4().hex}"
+    tmp_path = MAIL_SPOOL_DIR / f"{name}.tmp"
+    eml_path = MAIL_SPOOL_DIR / f"{name}.eml"
+    tmp_path.write_bytes(msg_bytes)
+    os.replace(tmp_path, eml_path)
+    return eml_path
+
+
+# try_deliver() outcomes
+DELIVERED = "delivered"
+DEFERRED = "deferred"   # relay unavailable / breaker open - keep in spool
+REJECTED = "rejected"   # relay refused this message for good - dead-letter it
+
+
+def is_permanent_rejection(exc: Exception) -> bool:
+    """
+    True if the relay answered and refused this particular message (5xx on
+    the recipients or the message data). Connection errors, timeouts, 4xx
+    replies and relay-level errors (auth, HELO) are not per-message.
+    """
+    if isinstance(exc, smtplib.SMTPRecipientsRefused):
+        return bool(exc.recipients) and all(code >= 500 for code, _ in exc.recipients.values())
+    if isinstance(exc, smtplib.SMTPDataError):
+        return exc.smtp_code >= 500
+    return False
+
+
+def try_deliver(to_email: str, msg_bytes: bytes) -> str:
+    """
+    Deliver through the circuit breaker. Only relay failures count against
+    the breaker; a permanent rejection means the relay is up.
+    """
+    if not smtp_breaker.allow():
+        return DEFERRED
+
+    try:
+        deliver_message(to_email, msg_bytes)
+    except (smtplib.SMTPException, OSError) as exc:
+        if is_permanent_rejection(exc):
+            smtp_breaker.record_success()
+            logger.warning("SMTP relay rejected message to %s: %s", to_email, exc)
+            return REJECTED
+        smtp_breaker.record_failure()
+        logger.warning("SMTP delivery to %s failed (%s); breaker %s", to_email, exc, smtp_breaker.state)
+        return DEFERRED
+
+    smtp_breaker.record_success()
+    return DELIVERED
+
+
+def flush_spool() -> int:
+    """
+    Deliver spooled messages oldest-first. Rejected messages are moved to the
+    dead-letter directory and skipped; a deferral (relay down, breaker open)
+    stops the pass since later messages would fail the same way.
+    Returns the number of messages sent.
+    """
+    sent = 0
+    for eml_path in sorted(MAIL_SPOOL_DIR.glob("*.eml")):
+        msg_bytes = eml_path.read_bytes()
+        to_email = message_from_bytes(msg_bytes)["To"]
+
+        outcome = try_deliver(to_email, msg_bytes)
+        if outcome == DEFERRED:
+            break
+
+        if outcome == REJECTED:
+            MAIL_DEAD_LETTER_DIR.mkdir(parents=True, exist_ok=True)
+            os.replace(eml_path, MAIL_DEAD_LETTER_DIR / eml_path.name)
+            continue
+
+        eml_path.unlink(missing_ok=True)
+        sent += 1
+    return sent
+
+
+# Set when a message is spooled so the flusher delivers it right away
+mail_spool_wakeup = asyncio.Event()
+
+
+async def spool_flusher():
+    """
+    Background task: deliver spooled mail as soon as it is queued, and retry
+    every MAIL_SPOOL_FLUSH_INTERVAL seconds while the relay is down.
+    """
+    while True:
+        try:
+            await asyncio.wait_for(mail_spool_wakeup.wait(), MAIL_SPOOL_FLUSH_INTERVAL)
+        except asyncio.TimeoutError:
+            pass
+        mail_spool_wakeup.clear()
+
+        try:
+            sent = await asyncio.to_thread(flush_spool)
+            if sent:
+                logger.info("Delivered %d spooled message(s)", sent)
+        except Exception:
+            logger.exception("Mail spool flush failed")
+
+
 def send_email(to_email: str, subject: str, body: str, pdf_data: bytes):
     """
-    Send an email with the Service Request Form PDF attached.
+    Queue an email with the Service Request Form PDF attached.
+    The message is written to the local spool and delivered by the
+    background flusher, so a slow or down relay never holds up a request.
     """
     msg = MIMEMultipart()
     msg["From"] = FROM_EMAIL
@@ -282,8 +822,572 @@ def send_email(to_email: str, subject: str, body: str, pdf_data: bytes):
     )
     msg.attach(pdf_attachment)
 
-    server = smtplib.SMTP(SMTP_SERVER, SMTP_PORT)
-    server.starttls()
-    server.login(SMTP_USERNAME, SMTP_PASSWORD)
-    server.sendmail(FROM_EMAIL, to_email, msg.as_string())
-    server.quit()
+    spool_message(msg.as_bytes())
+    mail_spool_wakeup.set()
+
+
+# Customer fields the intake form can be pre-filled with
+CUSTOMER_FIELDS = (
+    "customer_name",
+    "account_number",
+    "customer_address",
+    "contact_phone",
+    "contact_email",
+)
+
+
+def normalize_term(value) -> str:
+    return " ".join(str(value or "").split()).casefold()
+
+
+class CustomerIndex:
+    """
+    In-memory prefix index of known customers for autocomplete.
+    Profiles are kept in LRU order (lookups and inserts refresh them) and
+    capped at `max_customers` and at roughly `max_bytes` of text (fields
+    clipped to AUTOCOMPLETE_MAX_FIELD_LENGTH); searchable terms (name +
+    account number) live in a sorted list so a prefix lookup is a bisect
+    plus a short scan.
+    """
+
+    def __init__(self, max_customers: int, max_bytes: int = AUTOCOMPLETE_MAX_BYTES):
+        self.max_customers = max_customers
+        self.max_bytes = max_bytes
+        self.size_bytes = 0
+        self._profiles = OrderedDict()   # key -> customer profile dict
+        self._terms = []                 # sorted [(term, key), ...]
+
+    def __len__(self):
+        return len(self._profiles)
+
+    @staticmethod
+    def _profile(row: dict) -> dict:
+        return {
+            field: None if row.get(field) is None else str(row[field])[:AUTOCOMPLETE_MAX_FIELD_LENGTH]
+            for field in CUSTOMER_FIELDS
+        }
+
+    def _size(self, key: str, profile: dict) -> int:
+        # Profile text plus its key and terms; ignores per-object overhead
+        text = sum(len(value) for value in profile.values() if value)
+        return text + len(key) + sum(len(term) for term in self._profile_terms(profile))
+
+    def _store(self, key: str, profile: dict):
+        old = self._profiles.pop(key, None)
+        if old is not None:
+            self.size_bytes -= self._size(key, old)
+        self._profiles[key] = profile
+        self.size_bytes += self._size(key, profile)
+        return old
+
+    def _evict(self):
+        # Oldest first; the profile just stored is always kept
+        evicted = []
+        while len(self._profiles) > 1 and (
+            len(self._profiles) > self.max_customers or self.size_bytes > self.max_bytes
+        ):
+            key, profile = self._profiles.popitem(last=False)
+            self.size_bytes -= self._size(key, profile)
+            evicted.append((key, profile))
+        return evicted
+
+    @staticmethod
+    def _key(profile: dict) -> str:
+        # Account number identifies a customer; fall back to name if blank
+        return normalize_term(profile.get("account_number")) or normalize_term(profile.get("customer_name"))
+
+    @staticmethod
+    def _profile_terms(profile: dict):
+        terms = {normalize_term(profile.get("customer_name")), normalize_term(profile.get("account_number"))}
+        terms.discard("")
+        return terms
+
+    def _remove_terms(self, key: str, profile: dict):
+        for term in self._profile_terms(profile):
+            i = bisect_left(self._terms, (term, key))
+            if i < len(self._terms) and self._terms[i] == (term, key):
+                del self._terms[i]
+
+    def add(self, row: dict):
+        """
+        Insert or refresh a customer from a form row (latest row wins).
+        """
+        profile = self._profile(row)
+        key = self._key(profile)
+        if not key:
+            return
+
+        old = self._store(key, profile)
+        if old is not None:
+            self._remove_terms(key, old)
+        for term in self._profile_terms(profile):
+            insort(self._terms, (term, key))
+
+        for evicted_key, evicted in self._evict():
+            self._remove_terms(evicted_key, evicted)
+
+    def bulk_add(self, row: dict):
+        """
+        Like add(), but leaves the term list stale; call rebuild_terms()
+        once after loading. Avoids an insort per row on startup.
+        """
+        profile = self._profile(row)
+        key = self._key(profile)
+        if not key:
+            return
+
+        self._store(key, profile)
+        self._evict()
+
+    def rebuild_terms(self):
+        self._terms = sorted(
+            (term, key)
+            for key, profile in self._profiles.items()
+            for term in self._profile_terms(profile)
+        )
+
+    def search(self, prefix: str, limit: int = 10) -> list:
+        prefix = normalize_term(prefix)
+        if not prefix:
+            return []
+
+        results = []
+        seen = set()
+        i = bisect_left(self._terms, (prefix, ""))
+        while i < len(self._terms) and len(results) < limit:
+            term, key = self._terms[i]
+            if not term.startswith(prefix):
+                break
+            if key not in seen:
+                seen.add(key)
+                self._profiles.move_to_end(key)
+                results.append(self._profiles[key])
+            i += 1
+        return results
+
+
+customer_index = CustomerIndex(AUTOCOMPLETE_MAX_CUSTOMERS)
+
+
+def normalize_serial(value) -> str:
+    """
+    Serials are typed inconsistently: ignore case and whitespace.
+    Placeholders ("N/A", "unknown", "-") and too-short values normalize
+    to "" so unrelated machines are never grouped as one serial.
+    """
+    serial = "".join(str(value or "").split()).upper()
+    if (
+        len(serial) < MIN_SERIAL_LENGTH
+        or serial in SERIAL_PLACEHOLDERS
+        or not any(char.isalnum() for char in serial)
+    ):
+        return ""
+    return serial
+
+
+class EquipmentHistoryIndex:
+    """
+    Materialised per-serial service history summary.
+    Each serial keeps totals plus its most recent requests (newest first),
+    so history lookups and repeat-failure checks never scan the table.
+    """
+
+    def __init__(self, recent_limit: int, window_days: int):
+        self.recent_limit = recent_limit
+        self.window = timedelta(days=window_days)
+        self._summaries = {}   # normalized serial -> summary dict
+
+    def __len__(self):
+        return len(self._summaries)
+
+    def add(self, row: dict):
+        serial = normalize_serial(row.get("equipment_serial_number"))
+        if not serial:
+            return
+
+        created_at = row.get("created_at")
+        summary = self._summaries.get(serial)
+        if summary is None:
+            summary = self._summaries[serial] = {
+                "serial_number": serial,
+                "equipment_model": row.get("equipment_model"),
+                "request_count": 0,
+                "first_seen": created_at,
+                "last_seen": created_at,
+                "recent_requests": [],
+            }
+
+        summary["request_count"] += 1
+        summary["equipment_model"] = row.get("equipment_model") or summary["equipment_model"]
+        if created_at and (summary["last_seen"] is None or created_at >= summary["last_seen"]):
+            summary["last_seen"] = created_at
+        if created_at and (summary["first_seen"] is None or created_at < summary["first_seen"]):
+            summary["first_seen"] = created_at
+
+        recent = summary["recent_requests"]
+        recent.insert(0, {
+            "id": row.get("id"),
+            "created_at": created_at,
+            "customer_name": row.get("customer_name"),
+            "account_number": row.get("account_number"),
+            "issue_description": row.get("issue_description"),
+        })
+        del recent[self.recent_limit:]
+
+    def get(self, serial: str):
+        serial = normalize_serial(serial)
+        return self._summaries.get(serial) if serial else None
+
+    def repeat_failure(self, serial: str, now: datetime):
+        """
+        Prior requests on this serial within the repeat window, or None.
+        """
+        summary = self.get(serial)
+        if summary is None:
+            return None
+
+        cutoff = now - self.window
+        prior = [r for r in summary["recent_requests"] if r["created_at"] and r["created_at"] >= cutoff]
+        if not prior:
+            return None
+
+        return {
+            "count": len(prior),
+            "window_days": self.window.days,
+            "last_date": prior[0]["created_at"].strftime("%Y-%m-%d"),
+        }
+
+
+equipment_index = EquipmentHistoryIndex(EQUIPMENT_HISTORY_RECENT, REPEAT_FAILURE_DAYS)
+
+
+# Columns the in-memory indexes are built from
+INDEX_FIELDS = CUSTOMER_FIELDS + (
+    "id",
+    "equipment_serial_number",
+    "equipment_model",
+    "issue_description",
+    "created_at",
+)
+
+# Rows inserted while load_indexes() runs are held here and applied after it
+indexes_loading = True
+index_backlog = []
+
+
+def index_row(row: dict):
+    """
+    Add a newly inserted row to the customer and equipment indexes.
+    """
+    if indexes_loading:
+        index_backlog.append(row)
+        return
+    customer_index.add(row)
+    equipment_index.add(row)
+
+
+async def load_indexes():
+    """
+    Build the customer and equipment indexes from prior submissions in one
+    pass (oldest first, so each customer ends up with their latest details),
+    then swap them in and apply anything inserted meanwhile.
+    """
+    global customer_index, equipment_index, indexes_loading
+
+    customers = CustomerIndex(AUTOCOMPLETE_MAX_CUSTOMERS)
+    equipment = EquipmentHistoryIndex(EQUIPMENT_HISTORY_RECENT, REPEAT_FAILURE_DAYS)
+    last_id = 0
+
+    columns = [getattr(service_request_forms.c, field) for field in INDEX_FIELDS]
+    query = select(*columns).order_by(service_request_forms.c.id)
+    async for record in database.iterate(query):
+        row = {field: record[field] for field in INDEX_FIELDS}
+        customers.bulk_add(row)
+        equipment.add(row)
+        last_id = row["id"]
+    customers.rebuild_terms()
+
+    # No awaits from here on: swap and drain the backlog atomically
+    customer_index, equipment_index = customers, equipment
+    indexes_loading = False
+    for row in index_backlog:
+        if row["id"] > last_id:
+            index_row(row)
+    index_backlog.clear()
+
+
+PARTITION_NAME_RE = re.compile(r"^service_request_forms_(\d{4})_(\d{2})$")
+
+
+def add_months(month: date, n: int) -> date:
+    """
+    First day of the month `n` months after `month` (n may be negative).
+    """
+    index = month.year * 12 + month.month - 1 + n
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month: date) -> str:
+    return f"service_request_forms_{month.year:04d}_{month.month:02d}"
+
+
+def archive_path(month: date) -> Path:
+    return ARCHIVE_DIR / f"{partition_name(month)}.parquet"
+
+
+async def is_partitioned() -> bool:
+    row = await database.fetch_one(
+        "SELECT 1 FROM pg_partitioned_table pt "
+        "JOIN pg_class c ON c.oid = pt.partrelid "
+        "WHERE c.relname = 'service_request_forms'"
+    )
+    return row is not None
+
+
+async def list_partitions() -> list:
+    """
+    Months that currently have an attached partition, oldest first.
+    """
+    rows = await database.fetch_all(
+        "SELECT c.relname FROM pg_inherits i "
+        "JOIN pg_class c ON c.oid = i.inhrelid "
+        "JOIN pg_class p ON p.oid = i.inhparent "
+        "WHERE p.relname = 'service_request_forms'"
+    )
+    months = []
+    for row in rows:
+        match = PARTITION_NAME_RE.match(row["relname"])
+        if match:
+            months.append(date(int(match.group(1)), int(match.group(2)), 1))
+    return sorted(months)
+
+
+async def ensure_partitions(today: date):
+    """
+    Create partitions for the current month and the next few, so inserts
+    never land outside a partition.
+    """
+    current = today.replace(day=1)
+    for n in range(PARTITION_PREMAKE_MONTHS + 1):
+        month = add_months(current, n)
+        await database.execute(
+            f"CREATE TABLE IF NOT EXISTS {partition_name(month)} "
+            f"PARTITION OF service_request_forms "
+            f"FOR VALUES FROM ('{month.isoformat()}') TO ('{add_months(month, 1).isoformat()}')"
+        )
+
+
+def parquet_schema():
+    """
+    Arrow schema matching service_request_forms (explicit, so a batch of
+    all-NULL values can't change a column's inferred type mid-file).
+    """
+    # Imported lazily: only the archiver and archived reads need pyarrow
+    import pyarrow as pa
+
+    arrow_types = {
+        Integer: pa.int64(),
+        Text: pa.string(),
+        Date: pa.date32(),
+        DateTime: pa.timestamp("us"),
+    }
+    return pa.schema([(column.name, arrow_types[type(column.type)]) for column in service_request_forms.columns])
+
+
+def fsync_path(path: Path):
+    """
+    fsync a file or directory (a directory fsync makes a rename durable).
+    """
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+async def archive_partition(month: date):
+    """
+    Stream one monthly partition to a zstd Parquet file, then detach and
+    drop it. Export happens while the partition is still attached, so a
+    crash at any point leaves the data either live or archived (rerunning
+    is safe).
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    name = partition_name(month)
+    path = archive_path(month)
+    tmp_path = path.with_suffix(".tmp")
+    path.parent.mkdir(parents=True, exist_ok=True)
+
+    schema = parquet_schema()
+    columns = schema.names
+    row_count = 0
+    batch = []
+
+    writer = pq.ParquetWriter(tmp_path, schema, compression="zstd")
+    try:
+        async for record in database.iterate(f"SELECT {', '.join(columns)} FROM {name} ORDER BY id"):
+            batch.append({column: record[column] for column in columns})
+            if len(batch) >= ARCHIVE_BATCH_ROWS:
+                await asyncio.to_thread(writer.write_table, pa.Table.from_pylist(batch, schema=schema))
+                row_count += len(batch)
+                batch = []
+        if batch:
+            await asyncio.to_thread(writer.write_table, pa.Table.from_pylist(batch, schema=schema))
+            row_count += len(batch)
+    finally:
+        writer.close()
+
+    # The file must be on disk before the only other copy is dropped
+    if row_count:
+        await asyncio.to_thread(fsync_path, tmp_path)
+        os.replace(tmp_path, path)
+        await asyncio.to_thread(fsync_path, path.parent)
+    else:
+        tmp_path.unlink(missing_ok=True)
+
+    async with database.transaction():
+        await database.execute(f"ALTER TABLE service_request_forms DETACH PARTITION {name}")
+        await database.execute(f"DROP TABLE {name}")
+
+    logger.info("Archived partition %s (%d rows)", name, row_count)
+
+
+async def maintain_partitions():
+    if not await is_partitioned():
+        return
+
+    today = date.today()
+    await ensure_partitions(today)
+
+    if ARCHIVE_DIR is None:
+        return
+
+    cutoff = add_months(today.replace(day=1), -ARCHIVE_AFTER_MONTHS)
+    for month in await list_partitions():
+        if month < cutoff:
+            await archive_partition(month)
+
+
+async def partition_archiver():
+    """
+    Background task: keep future partitions created and, when ARCHIVE_DIR
+    is configured, archive old ones.
+    """
+    while True:
+        try:
+            await maintain_partitions()
+        except Exception:
+            logger.exception("Partition maintenance failed")
+        await asyncio.sleep(ARCHIVE_INTERVAL)
+
+
+def read_archived_requests(start: datetime, end: datetime) -> list:
+    """
+    Rows from archived Parquet files with start <= created_at < end.
+    """
+    import pyarrow.parquet as pq
+
+    rows = []
+    month = date(start.year, start.month, 1)
+    while datetime(month.year, month.month, 1) < end:
+        path = archive_path(month)
+        if path.exists():
+            table = pq.read_table(path, filters=[("created_at", ">=", start), ("created_at", "<", end)])
+            rows.extend(table.to_pylist())
+        month = add_months(month, 1)
+    return rows
+
+
+async def iterate_service_requests(start: datetime, end: datetime):
+    """
+    Single read API across live partitions and archived Parquet files.
+    Yields rows with start <= created_at < end, oldest first, one month at
+    a time: that month's archived rows, then its live rows (streamed).
+    """
+    columns = [column.name for column in service_request_forms.columns]
+    month = date(start.year, start.month, 1)
+    while datetime(month.year, month.month, 1) < end:
+        month_start = max(start, datetime(month.year, month.month, 1))
+        next_month = add_months(month, 1)
+        month_end = min(end, datetime(next_month.year, next_month.month, 1))
+
+        window = (
+            (service_request_forms.c.created_at >= month_start)
+            & (service_request_forms.c.created_at < month_end)
+        )
+
+        archived = []
+        if ARCHIVE_DIR is not None and archive_path(month).exists():
+            archived = await asyncio.to_thread(read_archived_requests, month_start, month_end)
+        if archived:
+            # A month can briefly exist in both places (archived, not yet dropped); live wins
+            live_ids = {row["id"] for row in await database.fetch_all(select(service_request_forms.c.id).where(window))}
+            for row in sorted(archived, key=lambda row: row["created_at"]):
+                if row["id"] not in live_ids:
+                    yield row
+
+        query = service_request_forms.select().where(window).order_by(
+            service_request_forms.c.created_at, service_request_forms.c.id
+        )
+        async for record in database.iterate(query):
+            yield {column: record[column] for column in columns}
+
+        month = next_month
+
+
+async def csv_chunks(rows, chunk_rows: int = 500):
+    """
+    Encode an async iterable of row dicts as CSV text, a few hundred rows
+    per chunk.
+    """
+    columns = [column.name for column in service_request_forms.columns]
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=columns, extrasaction="ignore")
+    writer.writeheader()
+
+    pending = 0
+    async for row in rows:
+        writer.writerow(row)
+        pending += 1
+        if pending >= chunk_rows:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+            pending = 0
+    yield buffer.getvalue()
+
+
+async def read_body_limited(request: Request, max_bytes: int) -> bytes:
+    """
+    Read a request body, refusing anything past max_bytes before it is
+    buffered: an oversized Content-Length is rejected up front, and the
+    stream is cut off as soon as it runs over (chunked or lying clients).
+    """
+    length = request.headers.get("content-length", "")
+    if length.isdigit() and int(length) > max_bytes:
+        raise HTTPException(status_code=413, detail="Payload too large")
+
+    body = bytearray()
+    async for chunk in request.stream():
+        body.extend(chunk)
+        if len(body) > max_bytes:
+            raise HTTPException(status_code=413, detail="Payload too large")
+    return bytes(body)
+
+
+def gunzip_limited(data: bytes, max_bytes: int) -> bytes:
+    """
+    Decompress a gzip body, refusing anything that inflates past max_bytes.
+    """
+    decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    try:
+        body = decompressor.decompress(data, max_bytes + 1)
+    except zlib.error:
+        raise HTTPException(status_code=400, detail="Invalid gzip body")
+    if len(body) > max_bytes:
+        raise HTTPException(status_code=413, detail="Payload too large")
+    if not decompressor.eof:
+        raise HTTPException(status_code=400, detail="Truncated gzip body")
+    return body
@@ -0,0 +1,52 @@
+-- app/sql/partition_service_request_forms.sql
+--
+-- One-off conversion of service_request_forms to monthly RANGE partitions
+-- on created_at. Run once with psql during a maintenance window:
+--   psql "$DATABASE_URL" -f app/sql/partition_service_request_forms.sql
+-- After this, the app's background task creates upcoming partitions and,
+-- if ARCHIVE_DIR is set, archives old ones (see maintain_partitions() in main.py).
+
+BEGIN;
+
+ALTER TABLE service_request_forms RENAME TO service_request_forms_legacy;
+
+-- Keep the existing id sequence alive after the legacy table is dropped
+ALTER SEQUENCE service_request_forms_id_seq OWNED BY NONE;
+
+-- INCLUDING DEFAULTS copies columns and defaults only, not indexes: the
+-- primary key is recreated below (it must include created_at). If any other
+-- index has been added to the legacy table, recreate it after the data copy.
+CREATE TABLE service_request_forms (
+    LIKE service_request_forms_legacy INCLUDING DEFAULTS
+) PARTITION BY RANGE (created_at);
+
+-- Partition key must be non-null and part of the primary key
+UPDATE service_request_forms_legacy SET created_at = now() WHERE created_at IS NULL;
+ALTER TABLE service_request_forms ALTER COLUMN created_at SET DEFAULT now();
+ALTER TABLE service_request_forms ALTER COLUMN created_at SET NOT NULL;
+ALTER TABLE service_request_forms ADD PRIMARY KEY (id, created_at);
+
+-- Monthly partitions from the oldest row through two months ahead
+-- (names must match partition_name() in main.py)
+DO $$
+DECLARE
+    month_start date := date_trunc('month', (SELECT COALESCE(min(created_at), now()) FROM service_request_forms_legacy));
+    last_month date := date_trunc('month', now()) + interval '2 months';
+BEGIN
+    WHILE month_start <= last_month LOOP
+        EXECUTE format(
+            'CREATE TABLE %I PARTITION OF service_request_forms FOR VALUES FROM (%L) TO (%L)',
+            'service_request_forms_' || to_char(month_start, 'YYYY_MM'),
+            month_start,
+            (month_start + interval '1 month')::date
+        );
+        month_start := (month_start + interval '1 month')::date;
+    END LOOP;
+END $$;
+
+INSERT INTO service_request_forms SELECT * FROM service_request_forms_legacy;
+
+COMMIT;
+
+-- Once the migrated data has been verified:
+--   DROP TABLE service_request_forms_legacy;
@@ -0,0 +1,145 @@
+// app/static/offline-queue.js
+//
+// IndexedDB-backed queue of form submissions, shared by the form page and
+// the service worker (importScripts). Each entry carries an idempotency_key
+// so replaying it after a lost response never creates a duplicate request.
+// Entries the server rejects as invalid move to a separate store so the
+// form page can show them for correction instead of losing them.
+
+(function (scope) {
+    const DB_NAME = "service-request-queue";
+    const STORE = "submissions";
+    const REJECTED_STORE = "rejected";
+    const REPLAY_URL = "/api/submissions";
+    const BATCH_SIZE = 50;
+    const TIMEOUT_MS = 30000;
+
+    function openDb() {
+        return new Promise(function (resolve, reject) {
+            const req = indexedDB.open(DB_NAME, 2);
+            req.onupgradeneeded = function () {
+                const db = req.result;
+                [STORE, REJECTED_STORE].forEach(function (name) {
+                    if (!db.objectStoreNames.contains(name)) {
+                        db.createObjectStore(name, { keyPath: "idempotency_key" });
+                    }
+                });
+            };
+            req.onsuccess = function () { resolve(req.result); };
+            req.onerror = function () { reject(req.error); };
+        });
+    }
+
+    function withStores(names, mode, fn) {
+        return openDb().then(function (db) {
+            return new Promise(function (resolve, reject) {
+                const tx = db.transaction(names, mode);
+                const result = fn.apply(null, names.map(function (name) { return tx.objectStore(name); }));
+                tx.oncomplete = function () { resolve(result && result.result); };
+                tx.onerror = function () { reject(tx.error); };
+            });
+        });
+    }
+
+    function enqueue(submission) {
+        return withStores([STORE], "readwrite", function (store) { return store.put(submission); });
+    }
+
+    function all() {
+        return withStores([STORE], "readonly", function (store) { return store.getAll(); });
+    }
+
+    function rejected() {
+        return withStores([REJECTED_STORE], "readonly", function (store) { return store.getAll(); });
+    }
+
+    function discardRejected(key) {
+        return withStores([REJECTED_STORE], "readwrite", function (store) { store.delete(key); });
+    }
+
+    // Apply one batch's results in a single transaction: stored/duplicate
+    // entries leave the queue, rejected ones move to the rejected store
+    // (with the server's reason), "error" entries stay queued.
+    function settle(batch, results) {
+        const byKey = {};
+        batch.forEach(function (entry) { byKey[entry.idempotency_key] = entry; });
+
+        return withStores([STORE, REJECTED_STORE], "readwrite", function (queue, rejectedStore) {
+            results.forEach(function (r) {
+                const entry = r.idempotency_key && byKey[r.idempotency_key];
+                if (!entry || r.status === "error") return;
+                if (r.status === "rejected") {
+                    rejectedStore.put(Object.assign({}, entry, { rejected_detail: r.detail }));
+                }
+                queue.delete(r.idempotency_key);
+            });
+        });
+    }
+
+    // gzip the JSON body where the browser supports CompressionStream
+    function encode(payload) {
+        const json = JSON.stringify(payload);
+        if (typeof CompressionStream === "undefined") {
+            return Promise.resolve({ body: json, headers: { "Content-Type": "application/json" } });
+        }
+        const stream = new Blob([json]).stream().pipeThrough(new CompressionStream("gzip"));
+        return new Response(stream).arrayBuffer().then(function (buf) {
+            return { body: buf, headers: { "Content-Type": "application/json", "Content-Encoding": "gzip" } };
+        });
+    }
+
+    // Server answered with an error status (as opposed to being unreachable)
+    function ServerError(status) {
+        this.name = "ServerError";
+        this.status = status;
+        this.message = "Replay failed: HTTP " + status;
+    }
+    ServerError.prototype = Object.create(Error.prototype);
+
+    function post(req) {
+        const controller = new AbortController();
+        const timer = setTimeout(function () { controller.abort(); }, TIMEOUT_MS);
+        return fetch(REPLAY_URL, {
+            method: "POST",
+            headers: req.headers,
+            body: req.body,
+            signal: controller.signal
+        }).finally(function () { clearTimeout(timer); });
+    }
+
+    // Replay everything queued, one batch at a time (see settle()). Moves on
+    // to the next batch only if this one removed something, so a server
+    // answering "error" for everything is not re-posted in a tight loop;
+    // the next online event, page load or sync retries. An HTTP error status
+    // rejects with a ServerError; anything else that rejects means offline.
+    function flush() {
+        return all().then(function (queued) {
+            if (!queued.length) return [];
+            const batch = queued.slice(0, BATCH_SIZE);
+            return encode({ submissions: batch })
+                .then(post)
+                .then(function (res) {
+                    if (!res.ok) throw new ServerError(res.status);
+                    return res.json();
+                })
+                .then(function (data) {
+                    const progressed = data.results.some(function (r) { return r.status !== "error"; });
+                    return settle(batch, data.results).then(function () {
+                        if (progressed && queued.length > BATCH_SIZE) {
+                            return flush().then(function (more) { return data.results.concat(more); });
+                        }
+                        return data.results;
+                    });
+                });
+        });
+    }
+
+    scope.offlineQueue = {
+        enqueue: enqueue,
+        all: all,
+        flush: flush,
+        rejected: rejected,
+        discardRejected: discardRejected,
+        ServerError: ServerError
+    };
+})(self);
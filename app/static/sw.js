@@ -0,0 +1,47 @@
+// app/static/sw.js  (served at /sw.js so its scope covers the form)
+//
+// Caches the form shell for offline use and replays queued submissions
+// via Background Sync where the browser supports it.
+
+importScripts("/static/offline-queue.js");
+
+const CACHE = "service-request-shell-v1";
+const SHELL = ["/", "/static/offline-queue.js"];
+
+self.addEventListener("install", function (event) {
+    event.waitUntil(caches.open(CACHE).then(function (cache) { return cache.addAll(SHELL); }));
+    self.skipWaiting();
+});
+
+self.addEventListener("activate", function (event) {
+    event.waitUntil(
+        caches.keys().then(function (keys) {
+            return Promise.all(keys.filter(function (k) { return k !== CACHE; }).map(function (k) {
+                return caches.delete(k);
+            }));
+        }).then(function () { return self.clients.claim(); })
+    );
+});
+
+// Shell: network first (keeps the form current), cached copy when offline
+self.addEventListener("fetch", function (event) {
+    const url = new URL(event.request.url);
+    if (event.request.method !== "GET" || url.origin !== self.location.origin || SHELL.indexOf(url.pathname) === -1) {
+        return;
+    }
+    event.respondWith(
+        fetch(event.request).then(function (res) {
+            const copy = res.clone();
+            caches.open(CACHE).then(function (cache) { cache.put(event.request, copy); });
+            return res;
+        }).catch(function () {
+            return caches.match(event.request);
+        })
+    );
+});
+
+self.addEventListener("sync", function (event) {
+    if (event.tag === "replay-submissions") {
+        event.waitUntil(self.offlineQueue.flush());
+    }
+});
@@ -0,0 +1,18 @@
+# app/tests/conftest.py
+
+import sys
+from pathlib import Path
+
+import pytest
+from fastapi.testclient import TestClient
+
+# The app runs as `uvicorn main:app` from app/, so tests import it the same way
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import main  # noqa: E402
+
+
+@pytest.fixture
+def client():
+    # Not used as a context manager: startup (DB connect, warm-up) is skipped
+    return TestClient(main.app)
@@ -0,0 +1,26 @@
+# app/tests/test_access.py
+
+from fastapi.testclient import TestClient
+
+import main
+
+
+def test_autocomplete_refused_outside_internal_networks(client, monkeypatch):
+    monkeypatch.setattr(main, "INTERNAL_NETWORKS", [main.ipaddress.ip_network("10.0.0.0/8")])
+    response = client.get("/api/customers/autocomplete", params={"q": "a"})
+    assert response.status_code == 403
+
+
+def test_autocomplete_allowed_from_internal_network(monkeypatch):
+    # TestClient reports its peer as "testclient" by default; put it on the LAN
+    monkeypatch.setattr(main, "INTERNAL_NETWORKS", [main.ipaddress.ip_network("10.0.0.0/8")])
+    client = TestClient(main.app, client=("10.1.2.3", 50000))
+    response = client.get("/api/customers/autocomplete", params={"q": "a"})
+    assert response.status_code == 200
+    assert response.json() == {"results": []}
+
+
+def test_equipment_history_refused_outside_internal_networks(client, monkeypatch):
+    monkeypatch.setattr(main, "INTERNAL_NETWORKS", [main.ipaddress.ip_network("10.0.0.0/8")])
+    response = client.get("/api/equipment/SN123/history")
+    assert response.status_code == 403
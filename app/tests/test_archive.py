@@ -0,0 +1,172 @@
+# app/tests/test_archive.py
+
+import asyncio
+from contextlib import asynccontextmanager
+from datetime import date, datetime
+
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+
+pq = pytest.importorskip("pyarrow.parquet")
+pa = pytest.importorskip("pyarrow")
+
+
+def row(request_id: int, created_at: datetime, customer_name: str = "Acme Foods") -> dict:
+    values = {column.name: None for column in main.service_request_forms.columns}
+    values.update(id=request_id, created_at=created_at, customer_name=customer_name)
+    return values
+
+
+def write_archive(month: date, rows: list):
+    path = main.archive_path(month)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    pq.write_table(pa.Table.from_pylist(rows, schema=main.parquet_schema()), path)
+
+
+class FakeDatabase:
+    """
+    Live rows for the read path; filters on the created_at window the
+    query binds. Records statements for the archive path.
+    """
+
+    def __init__(self, rows=()):
+        self.rows = list(rows)
+        self.statements = []
+
+    def _window(self, query):
+        params = query.compile().params
+        return params["created_at_1"], params["created_at_2"]
+
+    def _matching(self, query):
+        start, end = self._window(query)
+        return sorted(
+            (r for r in self.rows if start <= r["created_at"] < end),
+            key=lambda r: (r["created_at"], r["id"]),
+        )
+
+    async def fetch_all(self, query):
+        return self._matching(query)
+
+    async def iterate(self, query):
+        if isinstance(query, str):
+            self.statements.append(query)
+            for r in sorted(self.rows, key=lambda r: r["id"]):
+                yield r
+            return
+        for r in self._matching(query):
+            yield r
+
+    async def execute(self, query):
+        self.statements.append(query)
+
+    @asynccontextmanager
+    async def transaction(self):
+        yield
+
+
+@pytest.fixture
+def archive_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(main, "ARCHIVE_DIR", tmp_path / "archive")
+    return tmp_path / "archive"
+
+
+def collect(start: datetime, end: datetime) -> list:
+    async def run():
+        return [r async for r in main.iterate_service_requests(start, end)]
+    return asyncio.run(run())
+
+
+# --- month arithmetic ---
+
+@pytest.mark.parametrize("month, n, expected", [
+    (date(2026, 1, 1), -1, date(2025, 12, 1)),
+    (date(2026, 11, 1), 3, date(2027, 2, 1)),
+    (date(2026, 5, 1), -24, date(2024, 5, 1)),
+    (date(2026, 5, 1), 0, date(2026, 5, 1)),
+])
+def test_add_months(month, n, expected):
+    assert main.add_months(month, n) == expected
+
+
+def test_partition_name_round_trips_through_regex():
+    name = main.partition_name(date(2026, 3, 1))
+    assert name == "service_request_forms_2026_03"
+    assert main.PARTITION_NAME_RE.match(name).groups() == ("2026", "03")
+
+
+# --- archived reads ---
+
+def test_read_archived_requests_filters_by_created_at(archive_dir):
+    write_archive(date(2024, 1, 1), [row(1, datetime(2024, 1, 5)), row(2, datetime(2024, 1, 25))])
+    write_archive(date(2024, 2, 1), [row(3, datetime(2024, 2, 10))])
+
+    rows = main.read_archived_requests(datetime(2024, 1, 10), datetime(2024, 3, 1))
+    assert [r["id"] for r in rows] == [2, 3]
+    assert rows[0]["customer_name"] == "Acme Foods"
+
+
+def test_iterate_service_requests_merges_archive_and_live_live_wins(archive_dir, monkeypatch):
+    write_archive(date(2024, 1, 1), [
+        row(1, datetime(2024, 1, 5), "Archived only"),
+        row(2, datetime(2024, 1, 6), "Stale archived copy"),
+    ])
+    db = FakeDatabase([
+        row(2, datetime(2024, 1, 6), "Live copy"),
+        row(3, datetime(2024, 2, 1), "February"),
+        row(4, datetime(2024, 3, 1), "Outside range"),
+    ])
+    monkeypatch.setattr(main, "database", db)
+
+    rows = collect(datetime(2024, 1, 1), datetime(2024, 3, 1))
+    assert [(r["id"], r["customer_name"]) for r in rows] == [
+        (1, "Archived only"),
+        (2, "Live copy"),
+        (3, "February"),
+    ]
+
+
+# --- export endpoint ---
+
+@pytest.fixture
+def internal_client():
+    # Loopback is inside the default INTERNAL_NETWORKS
+    return TestClient(main.app, client=("127.0.0.1", 50000))
+
+
+def test_export_streams_csv(internal_client, monkeypatch):
+    monkeypatch.setattr(main, "ARCHIVE_DIR", None)
+    monkeypatch.setattr(main, "database", FakeDatabase([row(i, datetime(2026, 1, 1 + i)) for i in range(3)]))
+
+    response = internal_client.get("/api/requests/export", params={"start": "2026-01-01", "end": "2026-02-01"})
+    assert response.status_code == 200
+    lines = response.text.strip().splitlines()
+    assert lines[0].startswith("id,")
+    assert len(lines) == 4
+
+
+@pytest.mark.parametrize("start, end", [("2026-02-01", "2026-01-01"), ("2026-01-01", "9999-12-31")])
+def test_export_rejects_bad_ranges(internal_client, start, end):
+    response = internal_client.get("/api/requests/export", params={"start": start, "end": end})
+    assert response.status_code == 400
+
+
+# --- archiving ---
+
+def test_archive_partition_syncs_file_before_dropping(archive_dir, monkeypatch):
+    month = date(2024, 1, 1)
+    db = FakeDatabase([row(1, datetime(2024, 1, 5)), row(2, datetime(2024, 1, 6))])
+    monkeypatch.setattr(main, "database", db)
+    monkeypatch.setattr(main, "fsync_path", lambda path: db.statements.append(f"fsync {path}"))
+
+    asyncio.run(main.archive_partition(month))
+
+    path = main.archive_path(month)
+    assert pq.read_table(path).column("id").to_pylist() == [1, 2]
+    assert db.statements[1:] == [
+        f"fsync {path.with_suffix('.tmp')}",
+        f"fsync {path.parent}",
+        "ALTER TABLE service_request_forms DETACH PARTITION service_request_forms_2024_01",
+        "DROP TABLE service_request_forms_2024_01",
+    ]
@@ -0,0 +1,83 @@
+# app/tests/test_customer_index.py
+
+import main
+
+
+def customer(name: str, account: str, **fields) -> dict:
+    return {"customer_name": name, "account_number": account, **fields}
+
+
+def names(results) -> list:
+    return [profile["customer_name"] for profile in results]
+
+
+def test_search_matches_name_or_account_prefix():
+    index = main.CustomerIndex(max_customers=10)
+    index.add(customer("Acme Foods", "A100"))
+    index.add(customer("Acorn Deli", "B200"))
+    index.add(customer("Bayside Grill", "C300"))
+
+    assert names(index.search("ac")) == ["Acme Foods", "Acorn Deli"]
+    assert names(index.search("  ACME  ")) == ["Acme Foods"]
+    assert names(index.search("b2")) == ["Acorn Deli"]
+    assert index.search("zz") == []
+    assert index.search("") == []
+
+
+def test_search_respects_limit():
+    index = main.CustomerIndex(max_customers=10)
+    for i in range(5):
+        index.add(customer(f"Acme {i}", f"A{i}"))
+    assert len(index.search("acme", limit=3)) == 3
+
+
+def test_full_index_evicts_least_recently_used():
+    index = main.CustomerIndex(max_customers=2)
+    index.add(customer("Acme Foods", "A100"))
+    index.add(customer("Bayside Grill", "B200"))
+    index.search("acme")                           # Acme is now most recent
+    index.add(customer("Cedar Cafe", "C300"))
+
+    assert len(index) == 2
+    assert index.search("bayside") == []
+    assert names(index.search("acme")) == ["Acme Foods"]
+    assert names(index.search("cedar")) == ["Cedar Cafe"]
+
+
+def test_byte_budget_evicts_and_long_fields_are_clipped():
+    address = "x" * (main.AUTOCOMPLETE_MAX_FIELD_LENGTH * 5)
+    index = main.CustomerIndex(max_customers=100, max_bytes=600)
+    index.add(customer("Acme Foods", "A100", customer_address=address))
+    assert len(index.search("acme")[0]["customer_address"]) == main.AUTOCOMPLETE_MAX_FIELD_LENGTH
+
+    for i in range(5):
+        index.add(customer(f"Bayside {i}", f"B{i}", customer_address=address))
+
+    assert index.size_bytes <= 600
+    assert index.search("acme") == []
+    assert names(index.search("bayside 4")) == ["Bayside 4"]
+
+
+def test_refresh_replaces_old_terms():
+    index = main.CustomerIndex(max_customers=10)
+    index.add(customer("Acme Foods", "A100"))
+    size = index.size_bytes
+    index.add(customer("Apex Foods", "A100"))
+
+    assert len(index) == 1
+    assert index.search("acme") == []
+    assert names(index.search("apex")) == ["Apex Foods"]
+    assert index.size_bytes == size
+
+
+def test_bulk_add_matches_add_after_rebuild():
+    rows = [customer("Acme Foods", "A100"), customer("Bayside Grill", "B200"), customer("Apex Foods", "A100")]
+    added = main.CustomerIndex(max_customers=10)
+    bulk = main.CustomerIndex(max_customers=10)
+    for row in rows:
+        added.add(row)
+        bulk.bulk_add(row)
+    bulk.rebuild_terms()
+
+    assert bulk._terms == added._terms
+    assert bulk.size_bytes == added.size_bytes
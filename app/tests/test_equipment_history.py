@@ -0,0 +1,67 @@
+# app/tests/test_equipment_history.py
+
+from datetime import datetime, timedelta
+
+import pytest
+
+import main
+
+
+NOW = datetime(2026, 10, 15, 12, 0)
+
+
+def request(serial, days_ago: int, request_id: int = 1) -> dict:
+    return {
+        "id": request_id,
+        "equipment_serial_number": serial,
+        "equipment_model": "Slicer 3000",
+        "customer_name": "Acme Foods",
+        "issue_description": "Will not start",
+        "created_at": NOW - timedelta(days=days_ago),
+    }
+
+
+@pytest.fixture
+def index():
+    return main.EquipmentHistoryIndex(recent_limit=3, window_days=30)
+
+
+def test_serials_ignore_case_and_whitespace(index):
+    index.add(request("sn 12345", days_ago=1))
+    assert index.get(" SN12345 ")["request_count"] == 1
+
+
+def test_repeat_failure_inside_window(index):
+    index.add(request("SN12345", days_ago=40, request_id=1))
+    index.add(request("SN12345", days_ago=5, request_id=2))
+
+    flag = index.repeat_failure("sn12345", NOW)
+    assert flag == {"count": 1, "window_days": 30, "last_date": (NOW - timedelta(days=5)).strftime("%Y-%m-%d")}
+
+
+def test_no_repeat_failure_outside_window(index):
+    index.add(request("SN12345", days_ago=31))
+    assert index.repeat_failure("SN12345", NOW) is None
+    assert index.repeat_failure("SN99999", NOW) is None
+
+
+def test_recent_requests_capped_newest_first(index):
+    for i in range(5):
+        index.add(request("SN12345", days_ago=10 - i, request_id=i))
+
+    summary = index.get("SN12345")
+    assert summary["request_count"] == 5
+    assert [r["id"] for r in summary["recent_requests"]] == [4, 3, 2]
+    assert summary["first_seen"] == NOW - timedelta(days=10)
+    assert summary["last_seen"] == NOW - timedelta(days=6)
+    assert index.repeat_failure("SN12345", NOW)["count"] == 3
+
+
+@pytest.mark.parametrize("serial", ["N/A", "n/a", "unknown", "-", "---", "?", "none", "AB", "", None])
+def test_placeholder_serials_are_not_indexed_or_flagged(index, serial):
+    index.add(request(serial, days_ago=1))
+    index.add(request(serial, days_ago=2))
+
+    assert len(index) == 0
+    assert index.get(serial) is None
+    assert index.repeat_failure(serial, NOW) is None
@@ -0,0 +1,131 @@
+# app/tests/test_mail_delivery.py
+
+import smtplib
+
+import pytest
+
+import main
+
+
+def build_message(to_email: str) -> bytes:
+    return f"From: noreply@example.com\r\nTo: {to_email}\r\nSubject: test\r\n\r\nbody\r\n".encode()
+
+
+@pytest.fixture
+def spool(tmp_path, monkeypatch):
+    monkeypatch.setattr(main, "MAIL_SPOOL_DIR", tmp_path / "spool")
+    monkeypatch.setattr(main, "MAIL_DEAD_LETTER_DIR", tmp_path / "spool" / "dead_letter")
+    monkeypatch.setattr(main, "smtp_breaker", main.CircuitBreaker(threshold=2, cooldown=60))
+    return tmp_path / "spool"
+
+
+# --- CircuitBreaker ---
+
+def test_breaker_opens_after_threshold_consecutive_failures():
+    breaker = main.CircuitBreaker(threshold=3, cooldown=60)
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.state == "closed"
+    assert breaker.allow()
+
+    breaker.record_failure()
+    assert breaker.state == "open"
+    assert not breaker.allow()
+
+
+def test_breaker_success_resets_failure_count():
+    breaker = main.CircuitBreaker(threshold=2, cooldown=60)
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    assert breaker.state == "closed"
+
+
+def test_breaker_half_open_allows_a_single_trial():
+    breaker = main.CircuitBreaker(threshold=1, cooldown=0)
+    breaker.record_failure()
+    assert breaker.state == "half-open"
+
+    assert breaker.allow()
+    assert not breaker.allow()
+
+    breaker.record_success()
+    assert breaker.state == "closed"
+    assert breaker.allow()
+
+
+def test_breaker_failed_trial_reopens(monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr(main.time, "monotonic", lambda: clock[0])
+    breaker = main.CircuitBreaker(threshold=1, cooldown=60)
+    breaker.record_failure()
+
+    clock[0] += 61
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == "open"
+    assert not breaker.allow()
+
+
+# --- Error classification ---
+
+@pytest.mark.parametrize("exc, permanent", [
+    (smtplib.SMTPRecipientsRefused({"bad@example.com": (550, b"no such user")}), True),
+    (smtplib.SMTPRecipientsRefused({"busy@example.com": (451, b"try later")}), False),
+    (smtplib.SMTPDataError(554, b"message rejected"), True),
+    (smtplib.SMTPDataError(421, b"service not available"), False),
+    (smtplib.SMTPAuthenticationError(535, b"bad credentials"), False),
+    (smtplib.SMTPServerDisconnected("gone"), False),
+    (TimeoutError("timed out"), False),
+    (ConnectionRefusedError(), False),
+])
+def test_is_permanent_rejection(exc, permanent):
+    assert main.is_permanent_rejection(exc) is permanent
+
+
+# --- Spool flushing ---
+
+def test_flush_dead_letters_rejected_message_and_continues(spool, monkeypatch):
+    delivered = []
+
+    def fake_deliver(to_email, msg_bytes):
+        if to_email == "typo@example":
+            raise smtplib.SMTPRecipientsRefused({to_email: (550, b"no such user")})
+        delivered.append(to_email)
+
+    monkeypatch.setattr(main, "deliver_message", fake_deliver)
+    for to_email in ("first@example.com", "typo@example", "last@example.com"):
+        main.spool_message(build_message(to_email))
+
+    assert main.flush_spool() == 2
+    assert delivered == ["first@example.com", "last@example.com"]
+    assert list(spool.glob("*.eml")) == []
+    assert len(list((spool / "dead_letter").glob("*.eml"))) == 1
+    assert main.smtp_breaker.state == "closed"
+
+
+def test_flush_stops_and_keeps_messages_when_relay_is_down(spool, monkeypatch):
+    calls = []
+
+    def fake_deliver(to_email, msg_bytes):
+        calls.append(to_email)
+        raise ConnectionRefusedError()
+
+    monkeypatch.setattr(main, "deliver_message", fake_deliver)
+    for to_email in ("a@example.com", "b@example.com"):
+        main.spool_message(build_message(to_email))
+
+    assert main.flush_spool() == 0
+    assert calls == ["a@example.com"]
+    assert len(list(spool.glob("*.eml"))) == 2
+    assert main.smtp_breaker.failures == 1
+
+
+def test_flush_skips_delivery_while_breaker_is_open(spool, monkeypatch):
+    monkeypatch.setattr(main, "deliver_message", pytest.fail)
+    main.smtp_breaker.record_failure()
+    main.smtp_breaker.record_failure()
+    main.spool_message(build_message("a@example.com"))
+
+    assert main.flush_spool() == 0
+    assert len(list(spool.glob("*.eml"))) == 1
@@ -0,0 +1,187 @@
+# app/tests/test_replay.py
+
+import gzip
+import json
+from contextlib import asynccontextmanager
+
+import pytest
+from fastapi import HTTPException
+
+import main
+
+
+VALID_FIELDS = {
+    "customer_name": "Acme Foods",
+    "account_number": "A100",
+    "customer_address": "1 Main St",
+    "contact_email": "buyer@example.com",
+    "issue_description": "Slicer will not start",
+    "date": "2026-10-01",
+    "requester_name": "Pat",
+    "equipment_model": "S-200",
+    "equipment_serial_number": "SN123",
+    "on_site_customer_contact": "Pat",
+    "available_service_start_time": "08:00",
+    "available_service_end_time": "17:00",
+}
+
+
+class FakeDatabase:
+    """
+    Just enough of `databases.Database` for store_submission(): the key
+    table enforces uniqueness and a failed transaction rolls back.
+    """
+
+    def __init__(self, fail_insert=False):
+        self.keys = set()
+        self.rows = []
+        self.fail_insert = fail_insert
+
+    @asynccontextmanager
+    async def _transaction(self):
+        keys, rows = set(self.keys), list(self.rows)
+        try:
+            yield
+        except BaseException:
+            self.keys, self.rows = keys, rows
+            raise
+
+    def transaction(self):
+        return self._transaction()
+
+    async def fetch_val(self, query):
+        params = query.compile().params
+        if query.table is main.submission_idempotency_keys:
+            key = params["idempotency_key"]
+            if key in self.keys:
+                return None
+            self.keys.add(key)
+            return key
+
+        if self.fail_insert:
+            raise ConnectionResetError("connection lost")
+        self.rows.append(params)
+        return len(self.rows)
+
+    async def execute(self, query):
+        return None
+
+
+@pytest.fixture
+def fake_db(monkeypatch):
+    db = FakeDatabase()
+    delivered = []
+
+    async def fake_deliver(submission):
+        delivered.append(submission["form_id"])
+
+    monkeypatch.setattr(main, "database", db)
+    monkeypatch.setattr(main, "deliver_submission", fake_deliver)
+    monkeypatch.setattr(main, "index_row", lambda row: None)
+    db.delivered = delivered
+    return db
+
+
+def replay(client, submissions, compress=False):
+    body = json.dumps({"submissions": submissions}).encode()
+    headers = {"Content-Type": "application/json"}
+    if compress:
+        body = gzip.compress(body)
+        headers["Content-Encoding"] = "gzip"
+    return client.post("/api/submissions", content=body, headers=headers)
+
+
+# --- gunzip_limited ---
+
+def test_gunzip_limited_round_trip():
+    assert main.gunzip_limited(gzip.compress(b'{"a": 1}'), 100) == b'{"a": 1}'
+
+
+def test_gunzip_limited_accepts_exactly_max_bytes():
+    assert main.gunzip_limited(gzip.compress(b"x" * 100), 100) == b"x" * 100
+
+
+def test_gunzip_limited_refuses_oversized_body():
+    # Highly compressible: tiny on the wire, large once inflated
+    with pytest.raises(HTTPException) as exc_info:
+        main.gunzip_limited(gzip.compress(b"0" * 1_000_000), 1000)
+    assert exc_info.value.status_code == 413
+
+
+@pytest.mark.parametrize("data", [b"not gzip at all", gzip.compress(b"x" * 500)[:20]])
+def test_gunzip_limited_rejects_invalid_or_truncated_body(data):
+    with pytest.raises(HTTPException) as exc_info:
+        main.gunzip_limited(data, 1000)
+    assert exc_info.value.status_code == 400
+
+
+# --- /api/submissions ---
+
+def test_replay_stores_once_and_reports_duplicates(client, fake_db):
+    submission = {"idempotency_key": "key-1", **VALID_FIELDS}
+
+    first = replay(client, [submission], compress=True)
+    second = replay(client, [submission], compress=True)
+
+    assert first.json()["results"] == [{"idempotency_key": "key-1", "status": "created"}]
+    assert second.json()["results"] == [{"idempotency_key": "key-1", "status": "duplicate"}]
+    assert len(fake_db.rows) == 1
+    assert len(fake_db.delivered) == 1
+
+
+def test_replay_storage_error_is_retryable(client, fake_db):
+    fake_db.fail_insert = True
+    response = replay(client, [{"idempotency_key": "key-1", **VALID_FIELDS}])
+
+    assert response.status_code == 200
+    assert response.json()["results"] == [{"idempotency_key": "key-1", "status": "error"}]
+    # Rolled back with the row, so a later replay can still store it
+    assert fake_db.keys == set()
+
+    fake_db.fail_insert = False
+    response = replay(client, [{"idempotency_key": "key-1", **VALID_FIELDS}])
+    assert response.json()["results"][0]["status"] == "created"
+
+
+def test_replay_rejects_invalid_items_individually(client, fake_db):
+    response = replay(client, [
+        "not an object",
+        dict(VALID_FIELDS),
+        {"idempotency_key": "k" * (main.MAX_IDEMPOTENCY_KEY_LENGTH + 1), **VALID_FIELDS},
+        {"idempotency_key": "key-2", "customer_name": "Acme Foods"},
+        {"idempotency_key": "key-3", **VALID_FIELDS},
+    ])
+
+    results = response.json()["results"]
+    assert [r["status"] for r in results] == ["rejected", "rejected", "rejected", "rejected", "created"]
+    assert results[1]["detail"] == "Missing idempotency_key"
+    assert results[2]["detail"] == "idempotency_key is too long"
+    assert results[3]["detail"].startswith("Missing required field(s)")
+    assert fake_db.keys == {"key-3"}
+
+
+def test_replay_refuses_oversized_batch(client, fake_db):
+    submissions = [{"idempotency_key": f"key-{i}", **VALID_FIELDS} for i in range(main.MAX_REPLAY_BATCH + 1)]
+    assert replay(client, submissions).status_code == 400
+    assert fake_db.rows == []
+
+
+def test_replay_refuses_oversized_body_before_reading_it(client, fake_db, monkeypatch):
+    monkeypatch.setattr(main, "MAX_REPLAY_BYTES", 100)
+    body = json.dumps({"submissions": [{"idempotency_key": "key-1", **VALID_FIELDS}]}).encode()
+    response = client.post("/api/submissions", content=body, headers={"Content-Type": "application/json"})
+    assert response.status_code == 413
+    assert fake_db.rows == []
+
+
+def test_replay_refuses_oversized_chunked_body(client, fake_db, monkeypatch):
+    # No Content-Length: the cap has to hold while streaming
+    monkeypatch.setattr(main, "MAX_REPLAY_BYTES", 100)
+
+    def chunks():
+        for _ in range(10):
+            yield b" " * 50
+
+    response = client.post("/api/submissions", content=chunks(), headers={"Content-Type": "application/json"})
+    assert response.status_code == 413
+    assert fake_db.rows == []
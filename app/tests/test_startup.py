@@ -0,0 +1,99 @@
+# app/tests/test_startup.py
+
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+import main
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    # Record back-off delays instead of waiting them out
+    delays = []
+
+    async def fake_sleep(delay):
+        delays.append(delay)
+
+    monkeypatch.setattr(main.asyncio, "sleep", fake_sleep)
+    monkeypatch.setattr(main, "STARTUP_PROFILE", {})
+    return delays
+
+
+@pytest.fixture
+def not_ready(monkeypatch):
+    monkeypatch.setattr(main.app.state, "ready", False)
+    monkeypatch.setattr(main, "database", SimpleNamespace(is_connected=True))
+
+
+def failing_step(failures: int):
+    calls = []
+
+    async def step():
+        calls.append(None)
+        if len(calls) <= failures:
+            raise RuntimeError("not yet")
+
+    return step, calls
+
+
+# --- run_with_backoff ---
+
+def test_run_with_backoff_retries_until_step_succeeds(sleeps):
+    step, calls = failing_step(failures=3)
+    asyncio.run(main.run_with_backoff("Test step", "test_s", step))
+
+    assert len(calls) == 4
+    assert sleeps == [1, 2, 4]
+    assert "test_s" in main.STARTUP_PROFILE
+
+
+def test_run_with_backoff_caps_the_delay(sleeps, monkeypatch):
+    monkeypatch.setattr(main, "WARM_UP_MAX_BACKOFF", 5)
+    step, _ = failing_step(failures=5)
+    asyncio.run(main.run_with_backoff("Test step", "test_s", step))
+
+    assert sleeps == [1, 2, 4, 5, 5]
+
+
+# --- warm_up / readiness ---
+
+def test_readyz_is_503_until_warm_up_finishes(client, sleeps, not_ready, monkeypatch):
+    calls = []
+
+    async def fake_load_indexes():
+        calls.append("indexes")
+
+    monkeypatch.setattr(main, "load_indexes", fake_load_indexes)
+    monkeypatch.setattr(main, "generate_pdf", lambda form_data: calls.append("pdf"))
+
+    response = client.get("/readyz")
+    assert response.status_code == 503
+    assert response.json()["status"] == "starting"
+
+    asyncio.run(main.warm_up())
+
+    assert calls == ["indexes", "pdf"]
+    assert {"indexes_s", "warm_up_s"} <= main.STARTUP_PROFILE.keys()
+    response = client.get("/readyz")
+    assert response.status_code == 200
+    assert response.json()["status"] == "ready"
+
+
+def test_warm_up_retries_failed_index_load(sleeps, not_ready, monkeypatch):
+    step, calls = failing_step(failures=1)
+    monkeypatch.setattr(main, "load_indexes", step)
+    monkeypatch.setattr(main, "generate_pdf", lambda form_data: None)
+
+    asyncio.run(main.warm_up())
+
+    assert len(calls) == 2
+    assert sleeps == [1]
+    assert main.app.state.ready
+
+
+def test_readyz_is_503_without_database(client, monkeypatch):
+    monkeypatch.setattr(main.app.state, "ready", True)
+    monkeypatch.setattr(main, "database", SimpleNamespace(is_connected=False))
+    assert client.get("/readyz").status_code == 503